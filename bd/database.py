@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -17,4 +17,15 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def warmup_pool():
+    # Abre as conexões do pool antes de o worker aceitar tráfego
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = [engine.connect() for _ in range(size)]
+    try:
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
\ No newline at end of file
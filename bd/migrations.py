@@ -0,0 +1,44 @@
+from sqlalchemy import inspect, text
+
+# create_all só cria tabelas novas; as alterações em tabelas existentes
+# ficam aqui e podem ser executadas várias vezes sem efeito
+
+
+def _columns(connection, table):
+    return {column["name"]: column for column in inspect(connection).get_columns(table)}
+
+
+def _upgrade_user_ratings(connection):
+    columns = _columns(connection, "users")
+    postgres = connection.dialect.name == "postgresql"
+
+    for rating in ("rating_interview_front_react", "rating_interview_backend_python"):
+        if rating not in columns:
+            connection.execute(text(f"ALTER TABLE users ADD COLUMN {rating} DOUBLE PRECISION"))
+        elif postgres and columns[rating]["type"].python_type is str:
+            # As avaliações antigas eram texto com "N/A" por defeito
+            connection.execute(text(
+                f"ALTER TABLE users ALTER COLUMN {rating} DROP DEFAULT, "
+                f"ALTER COLUMN {rating} TYPE double precision USING NULLIF({rating}, 'N/A')::double precision"
+            ))
+        elif not postgres:
+            # SQLite não altera tipos de coluna; basta limpar o valor antigo
+            connection.execute(text(f"UPDATE users SET {rating} = NULL WHERE {rating} = 'N/A'"))
+
+    for counter in ("interviews_front_react", "interviews_backend_python"):
+        if counter not in columns:
+            connection.execute(text(f"ALTER TABLE users ADD COLUMN {counter} INTEGER DEFAULT 0 NOT NULL"))
+
+
+def upgrade_schema(engine):
+    with engine.begin() as connection:
+        if inspect(connection).has_table("users"):
+            _upgrade_user_ratings(connection)
+        if inspect(connection).has_table("idempotency_keys"):
+            if "locked_until" not in _columns(connection, "idempotency_keys"):
+                # Linhas antigas sem lease: expiram por expires_at
+                connection.execute(text("ALTER TABLE idempotency_keys ADD COLUMN locked_until TIMESTAMP"))
+        if inspect(connection).has_table("interview_results"):
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_interview_results_user_id ON interview_results (user_id, id)"
+            ))
@@ -0,0 +1,111 @@
+"""Mede bytes enviados e CPU por requisição com e sem CompressionMiddleware.
+
+    python bench_compression.py --cards 500 --requests 200
+
+A app ASGI é chamada diretamente, sem cliente HTTP: a CPU medida é só a
+do servidor (endpoint, serialização JSON, ETag e compressão) e os bytes
+são os do corpo tal como seriam enviados. Usa uma app mínima que devolve uma lista de flashcards no mesmo formato
+de /card/get-all, servida em processo (sem rede).
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from middleware.compression import CompressionMiddleware
+
+
+def build_app(cards: int, compressed: bool) -> FastAPI:
+    app = FastAPI()
+    flashcards = [
+        {
+            "id": i,
+            "question": f"¿Qué diferencia hay entre useEffect y useLayoutEffect? (variante {i})",
+            "category": "react",
+            "difficult": ("easy", "medium", "hard")[i % 3],
+        }
+        for i in range(cards)
+    ]
+
+    @app.get("/card/get-all")
+    def get_all():
+        return JSONResponse(content=jsonable_encoder(flashcards))
+
+    if compressed:
+        app.add_middleware(CompressionMiddleware)
+    return app
+
+
+def make_scope(headers: dict) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/card/get-all", "raw_path": b"/card/get-all",
+        "root_path": "", "query_string": b"", "server": ("bench", 80), "client": ("bench", 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+
+
+async def request_once(app: FastAPI, headers: dict):
+    response = {"status": None, "headers": {}, "body": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {name.decode(): value.decode() for name, value in message["headers"]}
+        elif message["type"] == "http.response.body":
+            response["body"] += len(message.get("body", b""))
+
+    await app(make_scope(headers), receive, send)
+    return response
+
+
+async def measure(app: FastAPI, requests: int, headers: dict):
+    # Aquece a app (montagem da pilha de middlewares) fora da medição
+    await request_once(app, headers)
+    sent = 0
+    cpu = 0.0
+    for _ in range(requests):
+        cpu_start = time.process_time()
+        response = await request_once(app, headers)
+        cpu += time.process_time() - cpu_start
+        sent += response["body"]
+    return sent / requests, cpu / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("sem middleware", False, {}),
+        ("gzip", True, {"Accept-Encoding": "gzip"}),
+        ("br", True, {"Accept-Encoding": "br, gzip"}),
+    ]
+
+    print(f"{'cenário':<16}  {'bytes/req':>10}  {'CPU ms/req':>10}")
+    for name, compressed, headers in scenarios:
+        app = build_app(args.cards, compressed)
+        size, cpu_ms = asyncio.run(measure(app, args.requests, headers))
+        print(f"{name:<16}  {size:>10.0f}  {cpu_ms:>10.3f}")
+
+    # Revalidação: o cliente devolve o ETag e recebe 304 sem corpo
+    app = build_app(args.cards, True)
+
+    async def revalidate():
+        etag = (await request_once(app, {}))["headers"]["etag"]
+        return await measure(app, args.requests, {"If-None-Match": etag, "Accept-Encoding": "gzip"})
+
+    size, cpu_ms = asyncio.run(revalidate())
+    print(f"{'304 (ETag)':<16}  {size:>10.0f}  {cpu_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
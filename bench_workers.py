@@ -0,0 +1,182 @@
+"""Mede o throughput com 1..N workers do gunicorn.
+
+    python bench_workers.py --max-workers 4 --duration 10
+
+Cada rodada arranca o gunicorn com gunicorn.conf.py, espera o /health
+responder e dispara requisições concorrentes durante --duration segundos.
+O gerador de carga corre em --clients processos, para não ser ele o gargalo.
+
+Por defeito mede /card/user-stats, que verifica o JWT (RS256), consulta a
+base de dados e serializa JSON. Sem --token o script gera uma chave RSA,
+serve o JWKS num servidor local que o gunicorn usa via JWKS_URL e cria o
+utilizador de teste na base de dados de DATABASE_URL.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+BENCH_USER_ID = "bench|user"
+BENCH_DOMAIN = "bench.invalid"
+BENCH_AUDIENCE = "bench"
+BENCH_KID = "bench"
+
+
+def _b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def make_signing_key():
+    """Devolve (token assinado, JWKS com a chave pública)."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = private_key.public_key().public_numbers()
+    jwks = {"keys": [{
+        "kty": "RSA", "kid": BENCH_KID, "use": "sig",
+        "n": _b64url_uint(numbers.n), "e": _b64url_uint(numbers.e),
+    }]}
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    claims = {
+        "sub": BENCH_USER_ID, "aud": BENCH_AUDIENCE, "iss": f"https://{BENCH_DOMAIN}/",
+        "exp": int(time.time()) + 24 * 3600,
+    }
+    return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": BENCH_KID}), jwks
+
+
+def serve_jwks(jwks: dict) -> ThreadingHTTPServer:
+    body = json.dumps(jwks).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def ensure_bench_user():
+    from bd.database import Base, SessionLocal, engine
+    from models.models import User
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if db.get(User, BENCH_USER_ID) is None:
+            db.add(User(id=BENCH_USER_ID, name="Bench"))
+            db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("O servidor não arrancou a tempo")
+
+
+async def run_load(base_url: str, path: str, headers: dict, concurrency: int, duration: float) -> int:
+    completed = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits) as client:
+        async def worker():
+            nonlocal completed
+            while time.monotonic() < deadline:
+                response = await client.get(path)
+                response.raise_for_status()
+                completed += 1
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return completed
+
+
+def load_process(base_url: str, path: str, headers: dict, concurrency: int, duration: float) -> int:
+    return asyncio.run(run_load(base_url, path, headers, concurrency, duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--path", default="/card/user-stats")
+    parser.add_argument("--token", default=None, help="Bearer token do Auth0; sem ele usa-se uma chave local")
+    parser.add_argument("--concurrency", type=int, default=64, help="Conexões por processo cliente")
+    parser.add_argument("--clients", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    server_env = {}
+    jwks_server = None
+    token = args.token
+    if token is None:
+        token, jwks = make_signing_key()
+        jwks_server = serve_jwks(jwks)
+        ensure_bench_user()
+        server_env = {
+            "JWKS_URL": f"http://127.0.0.1:{jwks_server.server_port}/.well-known/jwks.json",
+            "AUTH0_DOMAIN": BENCH_DOMAIN,
+            "AUTH0_AUDIENCE": BENCH_AUDIENCE,
+        }
+    headers = {"Authorization": f"Bearer {token}"}
+    baseline = None
+
+    print(f"{'workers':>7}  {'req/s':>10}  {'speedup':>7}")
+    for workers in range(1, args.max_workers + 1):
+        env = {**os.environ, **server_env, "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{args.port}"}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            with multiprocessing.Pool(args.clients) as pool:
+                completed = sum(pool.starmap(
+                    load_process,
+                    [(base_url, args.path, headers, args.concurrency, args.duration)] * args.clients
+                ))
+        finally:
+            server.terminate()
+            server.wait()
+
+        throughput = completed / args.duration
+        baseline = baseline or throughput
+        print(f"{workers:>7}  {throughput:>10.1f}  {throughput / baseline:>6.2f}x")
+
+    if jwks_server is not None:
+        jwks_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
 from bd.database import Base, engine
+from bd.migrations import upgrade_schema
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
@@ -0,0 +1,20 @@
+import multiprocessing
+import os
+
+# Modo multi-processo: gunicorn -c gunicorn.conf.py main:app
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Carrega a app uma vez no master (create_all, imports) e faz fork dos workers
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def post_fork(server, worker):
+    # As conexões abertas no master não podem ser partilhadas entre processos
+    from bd.database import engine
+    engine.dispose(close=False)
@@ -1,21 +1,57 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
+import httpx
+import logging
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from routers.auth import verify_token
-from bd.database import get_db, Base, engine
-from models.models import User
-from routers import user
+from routers.auth import verify_token, get_jwks
+from bd.database import get_db, Base, engine, warmup_pool
+from bd.migrations import upgrade_schema
+from models.models import User, UploadedImage
+from routers import user, flashcards
+from middleware.idempotency import IdempotencyMiddleware, idempotency_metrics
+from middleware.compression import CompressionMiddleware
+from storage import LocalStorage, get_storage, read_upload, process_image_offloaded, shutdown_process_pool
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-# Criar tabelas no banco
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Aquecimento por worker: JWKS e pool de conexões prontos antes do primeiro request
+    try:
+        await get_jwks()
+    except httpx.HTTPError as e:
+        # Sem JWKS o worker arranca na mesma; verify_token volta a tentar
+        logger.warning("Não foi possível pré-carregar o JWKS: %s", e)
+    await run_in_threadpool(warmup_pool)
+    yield
+    shutdown_process_pool()
+    engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+storage = get_storage()
+if isinstance(storage, LocalStorage):
+    app.mount(storage.base_url, StaticFiles(directory=storage.directory), name="uploads")
+
+# Criar tabelas no banco e atualizar as existentes
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+# ETag, Cache-Control, 304 e gzip/brotli nas respostas GET
+app.add_middleware(CompressionMiddleware)
+
+# Reenvios com a mesma Idempotency-Key devolvem a resposta guardada
+app.add_middleware(IdempotencyMiddleware)
 
 # Configurar CORS
 app.add_middleware(
@@ -27,6 +63,7 @@ app.add_middleware(
 )
 
 app.include_router(user.router)
+app.include_router(flashcards.router)
 
 # Modelos Pydantic
 class UserCreate(BaseModel):
@@ -45,15 +82,9 @@ class UserResponse(BaseModel):
     role: str
     profile_image: Optional[str]
 
-class UserStats(BaseModel):
-    good_answers: int
-    bad_answers: int
-    level: str
-    rating_interview_front_react: str
-    rating_interview_backend_python: str
-
 class UploadResponse(BaseModel):
     url: str
+    thumbnail_url: str
 
 # Endpoints
 @app.get("/api/user/{user_id}", response_model=UserResponse)
@@ -76,9 +107,9 @@ async def create_user(user: UserCreate, payload: dict = Depends(verify_token), d
         existing_user.name = user.name or existing_user.name
         existing_user.last_name = user.last_name or existing_user.last_name
         existing_user.profile_image = user.profile_image or existing_user.profile_image
-        existing_user.role = user.role
     else:
-        db_user = User(**user.dict())
+        # O papel (role) não vem do cliente; admins são promovidos no banco
+        db_user = User(**user.dict(exclude={"role"}))
         db.add(db_user)
     db.commit()
     return {"success": True}
@@ -95,32 +126,51 @@ async def update_user(
     db_user = db.query(User).filter(User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
-    for key, value in user.dict(exclude_unset=True).items():
+    for key, value in user.dict(exclude_unset=True, exclude={"id", "role"}).items():
         setattr(db_user, key, value)
     db.commit()
     return {"success": True}
 
-@app.get("/card/user-stats", response_model=UserStats)
-async def get_user_stats(payload: dict = Depends(verify_token), db: Session = Depends(get_db)):
+def _save_profile_image(db: Session, user: User, url: str, uploaded: Optional[UploadedImage] = None):
+    if uploaded is not None:
+        db.add(uploaded)
+    user.profile_image = url
+    try:
+        db.commit()
+    except IntegrityError:
+        # Outra requisição registou o mesmo hash ao mesmo tempo
+        db.rollback()
+        user.profile_image = url
+        db.commit()
+
+@app.post("/api/upload", response_model=UploadResponse)
+async def upload_image(request: Request, payload: dict = Depends(verify_token), db: Session = Depends(get_db)):
+    # Endpoint assíncrono: as chamadas à base de dados vão para o threadpool
     user_id = payload["sub"]
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await run_in_threadpool(db.query(User).filter(User.id == user_id).first)
     if not user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
-    stats = {
-        "good_answers": user.good_answers,
-        "bad_answers": user.bad_answers,
-        "level": user.level,
-        "rating_interview_front_react": user.rating_interview_front_react,
-        "rating_interview_backend_python": user.rating_interview_backend_python
-    }
-    return stats
 
-@app.post("/api/upload", response_model=UploadResponse)
-async def upload_image(payload: dict = Depends(verify_token)):
-    user_id = payload["sub"]
-    # Lógica de upload (ex.: salvar no S3)
-    return {"url": "https://exemplo.com/imagem.jpg"}
+    data, content_hash = await read_upload(request, "file")
+    image_name = f"{content_hash}.webp"
+    thumbnail_name = f"{content_hash}_thumb.webp"
+
+    # Mesma imagem já enviada antes: reutiliza sem decodificar nem subir de novo
+    uploaded = await run_in_threadpool(db.get, UploadedImage, content_hash)
+    if uploaded:
+        url, thumbnail_url = uploaded.url, uploaded.thumbnail_url
+        await run_in_threadpool(_save_profile_image, db, user, url)
+        return {"url": url, "thumbnail_url": thumbnail_url}
+
+    image, thumbnail = await process_image_offloaded(data)
+    url = await run_in_threadpool(storage.save, image_name, image, "image/webp")
+    thumbnail_url = await run_in_threadpool(storage.save, thumbnail_name, thumbnail, "image/webp")
+    await run_in_threadpool(
+        _save_profile_image, db, user, url,
+        UploadedImage(content_hash=content_hash, url=url, thumbnail_url=thumbnail_url)
+    )
+    return {"url": url, "thumbnail_url": thumbnail_url}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "OK"}
\ No newline at end of file
+    return {"status": "OK", "idempotency": idempotency_metrics}
\ No newline at end of file
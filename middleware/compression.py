@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import os
+import time
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:  # sem brotli instalado, só gzip
+    brotli = None
+
+load_dotenv()
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Acima disto a compressão corre no threadpool (gzip e brotli libertam o GIL)
+COMPRESSION_THREADPOOL_SIZE = int(os.getenv("COMPRESSION_THREADPOOL_SIZE", str(64 * 1024)))
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "private, no-cache")
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+# Níveis (gzip, brotli) conforme a carga de CPU por núcleo
+LEVELS_IDLE = (6, 5)
+LEVELS_BUSY = (1, 1)
+BUSY_LOAD_PER_CPU = 0.75
+
+_load_sample = {"busy": False, "sampled_at": 0.0}
+
+
+def _compression_levels():
+    # loadavg é amostrado no máximo uma vez por segundo
+    now = time.monotonic()
+    if now - _load_sample["sampled_at"] > 1.0:
+        try:
+            _load_sample["busy"] = os.getloadavg()[0] / (os.cpu_count() or 1) > BUSY_LOAD_PER_CPU
+        except (AttributeError, OSError):  # Windows
+            _load_sample["busy"] = False
+        _load_sample["sampled_at"] = now
+    return LEVELS_BUSY if _load_sample["busy"] else LEVELS_IDLE
+
+
+def _accepted_encodings(header: str):
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparação fraca: ignora o prefixo W/
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    gzip_level, brotli_level = _compression_levels()
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_level)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """ETag fraco, Cache-Control, 304 e compressão gzip/brotli para GETs.
+
+    O ETag é calculado sobre o corpo sem compressão, por isso é o mesmo
+    qualquer que seja a codificação negociada. Respostas que já trazem
+    ETag ou Content-Encoding (ex.: StaticFiles) e respostas enviadas em
+    vários blocos (StreamingResponse) passam sem alterações nem buffer.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, cache_control: str = CACHE_CONTROL,
+                 threadpool_size: int = COMPRESSION_THREADPOOL_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache_control = cache_control
+        self.threadpool_size = threadpool_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        request_headers = dict(scope["headers"])
+        start_message = None
+        passthrough = False
+
+        async def buffered_send(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                headers = {name.lower() for name, _ in message.get("headers", [])}
+                if message["status"] != 200 or b"etag" in headers or b"content-encoding" in headers:
+                    passthrough = True
+                    return await send(message)
+                start_message = message
+            elif message["type"] == "http.response.body":
+                if message.get("more_body", False):
+                    # Resposta em streaming: não se acumula, segue tal como vem
+                    passthrough = True
+                    await send(start_message)
+                    return await send(message)
+                await self._send_response(send, start_message, message.get("body", b""), request_headers)
+
+        await self.app(scope, receive, buffered_send)
+
+    async def _send_response(self, send, start_message, body, request_headers):
+        headers = [
+            (name, value) for name, value in start_message.get("headers", [])
+            if name.lower() not in (b"content-length", b"cache-control")
+        ]
+        content_type = next((value for name, value in headers if name.lower() == b"content-type"), b"")
+        cache_control = next(
+            (value for name, value in start_message.get("headers", []) if name.lower() == b"cache-control"),
+            self.cache_control.encode()
+        )
+
+        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers += [(b"etag", etag.encode()), (b"cache-control", cache_control)]
+
+        compressible = content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+        if compressible:
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match and _etag_matches(if_none_match.decode("latin-1"), etag):
+            headers = [(name, value) for name, value in headers if name.lower() != b"content-type"]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if compressible and len(body) >= self.minimum_size:
+            accepted = _accepted_encodings(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+            encoding = "br" if brotli is not None and "br" in accepted else "gzip" if "gzip" in accepted else None
+            if encoding:
+                if len(body) >= self.threadpool_size:
+                    body = await run_in_threadpool(_compress, body, encoding)
+                else:
+                    body = _compress(body, encoding)
+                headers.append((b"content-encoding", encoding.encode()))
+
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
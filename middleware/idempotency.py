@@ -0,0 +1,301 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import anyio
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from bd.database import SessionLocal
+from models.models import IdempotencyKey
+
+load_dotenv()
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH"}
+
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# Una reserva en curso más antigua que esto (ej.: worker matado por el
+# timeout de gunicorn) puede ser tomada por un reenvío
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", "60"))
+IDEMPOTENCY_MAX_BODY = int(os.getenv("IDEMPOTENCY_MAX_BODY", str(1024 * 1024)))
+# Fracción de reservas que, además, borra las claves caducadas de la tabla
+IDEMPOTENCY_PURGE_RATE = float(os.getenv("IDEMPOTENCY_PURGE_RATE", "0.01"))
+
+# Contadores por proceso
+idempotency_metrics = {"hits": 0, "misses": 0, "conflicts": 0, "mismatches": 0}
+
+
+class MemoryIdempotencyStore:
+    """Almacén en memoria, acotado en tamaño y con expiración. Un proceso.
+
+    Las respuestas guardadas viven en un TTLCache, que puede expulsarlas
+    cuando se llena. Las reservas en curso van aparte y nunca se expulsan:
+    perder una haría que un duplicado ejecutase el endpoint otra vez.
+    """
+
+    blocking = False
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL, maxsize: int = IDEMPOTENCY_MAX_KEYS,
+                 lock_ttl: int = IDEMPOTENCY_LOCK_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._lock_ttl = lock_ttl
+
+    def reserve(self, key: str, request_hash: str):
+        with self._lock:
+            now = time.monotonic()
+            record = self._in_flight.get(key)
+            if record is not None and record["locked_until"] >= now:
+                return record
+            if record is None:
+                record = self._cache.get(key)
+                if record is not None:
+                    return record
+            # Clave libre, o reserva abandonada cuyo lease venció
+            self._in_flight[key] = {
+                "request_hash": request_hash,
+                "status_code": None,
+                "locked_until": now + self._lock_ttl,
+            }
+            return None
+
+    def save(self, key: str, status_code: int, content_type, body: bytes):
+        with self._lock:
+            record = self._in_flight.pop(key, None)
+            if record is not None:
+                self._cache[key] = {**record, "status_code": status_code, "content_type": content_type, "body": body}
+
+    def release(self, key: str):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._cache.pop(key, None)
+
+
+def _utcnow():
+    # Columnas DateTime sin zona horaria, en UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class DatabaseIdempotencyStore:
+    """Almacén en la tabla idempotency_keys, compartido entre workers."""
+
+    blocking = True
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL, lock_ttl: int = IDEMPOTENCY_LOCK_TTL,
+                 purge_rate: float = IDEMPOTENCY_PURGE_RATE):
+        self._ttl = timedelta(seconds=ttl)
+        self._lock_ttl = timedelta(seconds=lock_ttl)
+        self._purge_rate = purge_rate
+
+    def purge_expired(self):
+        db = SessionLocal()
+        try:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < _utcnow()))
+            db.commit()
+        finally:
+            db.close()
+
+    def reserve(self, key: str, request_hash: str):
+        # La limpieza no va en cada petición: sólo en una fracción de ellas
+        if random.random() < self._purge_rate:
+            self.purge_expired()
+
+        db = SessionLocal()
+        try:
+            now = _utcnow()
+            db.add(IdempotencyKey(
+                key=key, request_hash=request_hash,
+                locked_until=now + self._lock_ttl, expires_at=now + self._ttl
+            ))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                # Otro worker ya reservó la clave
+                db.rollback()
+
+            # Se toma la fila si caducó (aún sin purgar) o si es una reserva
+            # abandonada cuyo lease venció
+            taken = db.execute(
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.key == key,
+                    or_(
+                        IdempotencyKey.expires_at < now,
+                        and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_until < now),
+                    ),
+                )
+                .values(
+                    request_hash=request_hash, status_code=None, content_type=None, body=None,
+                    locked_until=now + self._lock_ttl, expires_at=now + self._ttl
+                )
+            ).rowcount
+            db.commit()
+            if taken:
+                return None
+
+            record = db.get(IdempotencyKey, key)
+            if record is None:
+                # Borrada entre el INSERT y la lectura; el cliente reintenta
+                return {"request_hash": request_hash, "status_code": None}
+            return {
+                "request_hash": record.request_hash,
+                "status_code": record.status_code,
+                "content_type": record.content_type,
+                "body": record.body,
+            }
+        finally:
+            db.close()
+
+    def save(self, key: str, status_code: int, content_type, body: bytes):
+        db = SessionLocal()
+        try:
+            record = db.get(IdempotencyKey, key)
+            if record is not None:
+                record.status_code = status_code
+                record.content_type = content_type
+                record.body = body
+                db.commit()
+        finally:
+            db.close()
+
+    def release(self, key: str):
+        db = SessionLocal()
+        try:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            db.commit()
+        finally:
+            db.close()
+
+
+def get_idempotency_store():
+    if IDEMPOTENCY_BACKEND == "db":
+        return DatabaseIdempotencyStore()
+    return MemoryIdempotencyStore()
+
+
+class IdempotencyMiddleware:
+    """Reenvía la respuesta guardada cuando un cliente repite una petición
+    de escritura con la misma cabecera Idempotency-Key.
+
+    La clave se asocia al token y a la ruta, así dos usuarios no comparten
+    respuestas. Sólo se guardan respuestas 2xx; si la petición original
+    falla o se cancela la clave se libera para que el reintento se ejecute
+    de nuevo. Los cuerpos multipart (subidas) no se guardan en memoria y
+    pasan sin idempotencia.
+    """
+
+    def __init__(self, app, store=None, max_body: int = IDEMPOTENCY_MAX_BODY):
+        self.app = app
+        self.store = store or get_idempotency_store()
+        self.max_body = max_body
+
+    async def _call_store(self, method, *args):
+        if self.store.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key or headers.get(b"content-type", b"").startswith(b"multipart/"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body:
+            return await self._send(send, 413, b'{"detail":"Cuerpo demasiado grande"}')
+
+        # Se lee el cuerpo completo (acotado) para poder compararlo con el original
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body:
+                return await self._send(send, 413, b'{"detail":"Cuerpo demasiado grande"}')
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        request_body = b"".join(chunks)
+
+        key = hashlib.sha256(b"\0".join([
+            headers.get(b"authorization", b""),
+            scope["method"].encode(),
+            scope["path"].encode(),
+            idempotency_key,
+        ])).hexdigest()
+        request_hash = hashlib.sha256(request_body).hexdigest()
+
+        record = await self._call_store(self.store.reserve, key, request_hash)
+        if record is not None:
+            if record["request_hash"] != request_hash:
+                idempotency_metrics["mismatches"] += 1
+                return await self._send(send, 422, b'{"detail":"Idempotency-Key reutilizada con otro cuerpo"}')
+            if record["status_code"] is None:
+                idempotency_metrics["conflicts"] += 1
+                return await self._send(send, 409, b'{"detail":"Petici\\u00f3n en curso con esta Idempotency-Key"}')
+            idempotency_metrics["hits"] += 1
+            return await self._send(
+                send, record["status_code"], record["body"], record["content_type"], replayed=True
+            )
+        idempotency_metrics["misses"] += 1
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": request_body, "more_body": False}
+            return await receive()
+
+        response = {"status_code": 500, "content_type": None, "body": []}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status_code"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        response["content_type"] = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        saved = False
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if 200 <= response["status_code"] < 300:
+                await self._call_store(
+                    self.store.save, key, response["status_code"], response["content_type"], b"".join(response["body"])
+                )
+                saved = True
+        finally:
+            if not saved:
+                # También al cancelar (cliente desconectado, shutdown)
+                with anyio.CancelScope(shield=True):
+                    await self._call_store(self.store.release, key)
+
+    async def _send(self, send, status_code, body, content_type="application/json", replayed=False):
+        headers = [(b"content-length", str(len(body)).encode())]
+        if content_type:
+            headers.append((b"content-type", content_type.encode("latin-1")))
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
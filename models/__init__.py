@@ -1 +1 @@
-from .models import User
\ No newline at end of file
+from .models import User, InterviewResult, UploadedImage, IdempotencyKey
\ No newline at end of file
@@ -1,5 +1,5 @@
 from bd.database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -16,8 +16,11 @@ class User(Base):
     good_answers = Column(Integer, default=0)
     bad_answers = Column(Integer, default=0)
     level = Column(String(50), default="Beginner")
-    rating_interview_front_react = Column(String(50), default="N/A")
-    rating_interview_backend_python = Column(String(50), default="N/A")
+    rating_interview_front_react = Column(Float, nullable=True)
+    rating_interview_backend_python = Column(Float, nullable=True)
+    interviews_front_react = Column(Integer, default=0, nullable=False)
+    interviews_backend_python = Column(Integer, default=0, nullable=False)
+    interview_results = relationship("InterviewResult", back_populates="user", cascade="all, delete-orphan", lazy="dynamic")
 
 class Flashcard(Base):
     __tablename__ = 'Flashcard'
@@ -51,4 +54,36 @@ class EntrevistaFrontEndReact(Base):
 class EntrevistaBackEndPython(Base):
     __tablename__ = 'backendpython'
     id = Column(Integer, primary_key=True, index=True)
-    question = Column(String, nullable=False)
\ No newline at end of file
+    question = Column(String, nullable=False)
+
+class InterviewResult(Base):
+    __tablename__ = "interview_results"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(255), ForeignKey("users.id"), nullable=False)
+    track = Column(String(50), nullable=False)
+    score = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    user = relationship("User", back_populates="interview_results")
+
+    # Histórico paginado por id DESC, com ou sem filtro de track
+    __table_args__ = (
+        Index("ix_interview_results_user_id", "user_id", "id"),
+        Index("ix_interview_results_user_track_id", "user_id", "track", "id"),
+    )
+
+class UploadedImage(Base):
+    __tablename__ = "uploaded_images"
+    content_hash = Column(String(64), primary_key=True)
+    url = Column(String(255), nullable=False)
+    thumbnail_url = Column(String(255), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    key = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL mientras la petición original está en curso
+    content_type = Column(String(255), nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    locked_until = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
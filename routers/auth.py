@@ -1,24 +1,72 @@
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
+import asyncio
 import httpx
+import logging
 from typing import Dict
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 AUTH0_AUDIENCE = os.getenv("AUTH0_AUDIENCE")
-JWKS_URL = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
+JWKS_URL = os.getenv("JWKS_URL", f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "3600"))
+# Intervalo mínimo entre recargas forçadas, para que tokens com kid
+# inventado não disparem uma chamada ao Auth0 por requisição
+JWKS_MIN_REFRESH_INTERVAL = 60
 
 security = HTTPBearer()
+logger = logging.getLogger(__name__)
 
-async def get_jwks() -> Dict:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(JWKS_URL)
-        response.raise_for_status()
-        return response.json()
+# JWKS em cache por processo; cada worker o carrega no arranque
+_jwks_cache: Dict = {"jwks": None, "fetched_at": 0.0}
+# Uma só recarga de cada vez: os pedidos concorrentes esperam por ela
+_jwks_lock = asyncio.Lock()
+
+def _jwks_needs_refresh(force_refresh: bool) -> bool:
+    age = time.monotonic() - _jwks_cache["fetched_at"]
+    if _jwks_cache["jwks"] is None or age > JWKS_CACHE_TTL:
+        return True
+    return force_refresh and age > JWKS_MIN_REFRESH_INTERVAL
+
+async def get_jwks(force_refresh: bool = False) -> Dict:
+    if not _jwks_needs_refresh(force_refresh):
+        return _jwks_cache["jwks"]
+
+    async with _jwks_lock:
+        # Outro pedido pode ter recarregado enquanto se esperava
+        if not _jwks_needs_refresh(force_refresh):
+            return _jwks_cache["jwks"]
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(JWKS_URL)
+                response.raise_for_status()
+                _jwks_cache["jwks"] = response.json()
+                _jwks_cache["fetched_at"] = time.monotonic()
+        except httpx.HTTPError as e:
+            if _jwks_cache["jwks"] is None:
+                raise
+            # Auth0 indisponível: continua com as chaves em cache e volta
+            # a tentar passado JWKS_MIN_REFRESH_INTERVAL
+            logger.warning("Falha ao recarregar o JWKS, a usar o cache: %s", e)
+            _jwks_cache["fetched_at"] = time.monotonic() - JWKS_CACHE_TTL + JWKS_MIN_REFRESH_INTERVAL
+    return _jwks_cache["jwks"]
+
+def find_rsa_key(jwks: Dict, kid: str) -> Dict:
+    for key in jwks["keys"]:
+        if key["kid"] == kid:
+            return {
+                "kty": key["kty"],
+                "kid": key["kid"],
+                "use": key["use"],
+                "n": key["n"],
+                "e": key["e"],
+            }
+    return {}
 
 async def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> Dict:
     try:
@@ -26,17 +74,11 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Security(secu
         jwks = await get_jwks()
         unverified_header = jwt.get_unverified_header(token)
 
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"],
-                }
-                break
+        rsa_key = find_rsa_key(jwks, unverified_header["kid"])
+        if not rsa_key:
+            # Chave desconhecida: o Auth0 pode ter rotacionado as chaves
+            jwks = await get_jwks(force_refresh=True)
+            rsa_key = find_rsa_key(jwks, unverified_header["kid"])
 
         if not rsa_key:
             raise HTTPException(status_code=401, detail="Chave pública não encontrada no JWKS")
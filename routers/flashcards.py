@@ -1,22 +1,19 @@
 from enum import Enum
-import os
-from datetime import timedelta, datetime, timezone
 from fastapi import APIRouter, HTTPException, Query, status, Depends
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import Annotated, Optional
-from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from typing import Annotated, Dict, Optional
 from dotenv import load_dotenv
-import google.generativeai as genai
 from models.models import (
     CustomFlashcard, EntrevistaBackEndPython, EntrevistaFrontEndReact,
-    User as UserModel, Flashcard as FlashCardModel, CodingFlashcard
+    User as UserModel, Flashcard as FlashCardModel, CodingFlashcard,
+    InterviewResult
 )
-from bd.database import SessionLocal
+from bd.database import get_db
+from routers.auth import verify_token
 
 load_dotenv()
 
@@ -27,15 +24,7 @@ router = APIRouter(
 )
 
 # Dependencias
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 db_dependency = Annotated[Session, Depends(get_db)]
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Modelos Pydantic para solicitudes
 
@@ -70,23 +59,23 @@ class CreateBackendPythonQuestionRequest(BaseModel):
 
 
 # Funciones de utilidad
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=["HS256"])
-        user_id: int = payload.get("id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Credenciales inválidas")
-        
-        user = db.query(UserModel).filter(UserModel.id == user_id).first()
-        if user is None:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        
-        return user
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token inválido")
+def get_current_user(payload: Dict = Depends(verify_token), db: Session = Depends(get_db)):
+    # Mismo token de Auth0 que los endpoints de /api/user
+    user = db.query(UserModel).filter(UserModel.id == payload["sub"]).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return user
+
+def require_admin(current_user: UserModel = Depends(get_current_user)):
+    # Crear, editar o borrar preguntas del banco común es sólo para admins
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Acceso restringido a administradores")
+    return current_user
+
+admin_only = [Depends(require_admin)]
 
 # Rutas para Flashcards
-@router.post('/register', status_code=status.HTTP_201_CREATED, summary="Register a flashcard")
+@router.post('/register', status_code=status.HTTP_201_CREATED, summary="Register a flashcard", dependencies=admin_only)
 def register_flashcard(db: db_dependency, create_card_request: CreateCardRequest):
     new_card = FlashCardModel(
         question=create_card_request.question,
@@ -114,13 +103,13 @@ def get_flashcard_by_id(db: db_dependency, id: str):
         raise HTTPException(status_code=404, detail="Flashcard not found")
     return JSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(card))
 
-@router.delete('/by-id/{id}', status_code=status.HTTP_200_OK, summary="Delete a flashcard by ID")
+@router.delete('/by-id/{id}', status_code=status.HTTP_200_OK, summary="Delete a flashcard by ID", dependencies=admin_only)
 def delete_flashcard_by_id(db: db_dependency, id: str):
     card = db.query(FlashCardModel).filter(FlashCardModel.id == id).first()
-    db.delete(card)
-    db.commit()
     if not card:
         raise HTTPException(status_code=404, detail="Flashcard not found")
+    db.delete(card)
+    db.commit()
     return JSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder({"message": "Flashcard deleted successfully"}))
 
 @router.get('/by-category/{category}', status_code=status.HTTP_200_OK, summary="Get flashcards by category")
@@ -130,7 +119,7 @@ def get_flashcards_by_category(db: db_dependency, category: str):
         raise HTTPException(status_code=404, detail="No flashcards found for the specified category")
     return JSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(cards))
 
-@router.put('/update/{id}', status_code=status.HTTP_200_OK, summary="Update flashcard by ID")
+@router.put('/update/{id}', status_code=status.HTTP_200_OK, summary="Update flashcard by ID", dependencies=admin_only)
 def update_flashcard(db: db_dependency, id: int, update_card_request: CreateCardRequest):
     card_to_update = db.query(FlashCardModel).filter(FlashCardModel.id == id).first()
     if not card_to_update:
@@ -185,7 +174,7 @@ def get_random_questions(
 
 
 # Rutas para Coding Flashcards
-@router.post('/register-codingcard', status_code=status.HTTP_201_CREATED, summary="Register a coding flashcard")
+@router.post('/register-codingcard', status_code=status.HTTP_201_CREATED, summary="Register a coding flashcard", dependencies=admin_only)
 def register_coding_flashcard(db: db_dependency, create_card_request: CreateCodingCardRequest):
     new_card = CodingFlashcard(
         question=create_card_request.question,
@@ -288,7 +277,7 @@ def get_random_custom_questions(
     return result
 
 # Rutas para EntrevistaFrontEndReact
-@router.post('/frontend-react', status_code=status.HTTP_201_CREATED, summary="Create a frontend React interview question")
+@router.post('/frontend-react', status_code=status.HTTP_201_CREATED, summary="Create a frontend React interview question", dependencies=admin_only)
 def create_frontend_react_question(
     create_request: CreateFrontendReactQuestionRequest,
     db: db_dependency
@@ -324,7 +313,7 @@ def get_all_frontend_react_questions(db: db_dependency, limit: int = Query(20)):
     return JSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(result))
 
 # Rutas para EntrevistaBackEndPython
-@router.post('/backend-python', status_code=status.HTTP_201_CREATED, summary="Create a backend Python interview question")
+@router.post('/backend-python', status_code=status.HTTP_201_CREATED, summary="Create a backend Python interview question", dependencies=admin_only)
 def create_backend_python_question(
     create_request: CreateBackendPythonQuestionRequest,
     db: db_dependency
@@ -416,8 +405,14 @@ def update_user_level(
 
 #interview
 
+# track -> (columna media, columna contador) cacheadas en User
+INTERVIEW_TRACKS = {
+    "frontend_react": (UserModel.rating_interview_front_react, UserModel.interviews_front_react),
+    "backend_python": (UserModel.rating_interview_backend_python, UserModel.interviews_backend_python),
+}
+
 class UpdateInterviewRatingRequest(BaseModel):
-    rating: int
+    rating: int = Field(ge=0, le=10)
     interview_type: str
 
 @router.put('/update-interview-rating', status_code=status.HTTP_200_OK, summary="Update interview rating")
@@ -426,16 +421,33 @@ def update_interview_rating(
     db: db_dependency,
     current_user: UserModel = Depends(get_current_user)
 ):
-    user = db.query(UserModel).filter(UserModel.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
-    if update_request.interview_type == "frontend_react":
-        user.rating_interview_front_react += update_request.rating
-    elif update_request.interview_type == "backend_python":
-        user.rating_interview_backend_python += update_request.rating
-    else:
+    if update_request.interview_type not in INTERVIEW_TRACKS:
         raise HTTPException(status_code=400, detail="Tipo de entrevista no válido")
+    rating_column, count_column = INTERVIEW_TRACKS[update_request.interview_type]
+
+    db.add(InterviewResult(
+        user_id=current_user.id,
+        track=update_request.interview_type,
+        score=update_request.rating
+    ))
+
+    # Media y contador se recalculan en un único UPDATE para que las
+    # peticiones concurrentes no pisen el valor leído por otra
+    updated = (
+        db.query(UserModel)
+        .filter(UserModel.id == current_user.id)
+        .update(
+            {
+                rating_column: (func.coalesce(rating_column, 0) * count_column + update_request.rating)
+                / (count_column + 1),
+                count_column: count_column + 1,
+            },
+            synchronize_session=False
+        )
+    )
+    if not updated:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     db.commit()
     return JSONResponse(
@@ -443,6 +455,43 @@ def update_interview_rating(
         content=jsonable_encoder({"message": "Interview rating updated successfully"})
     )
 
+@router.get('/interview-history', status_code=status.HTTP_200_OK, summary="Get interview results history")
+def get_interview_history(
+    db: db_dependency,
+    interview_type: Optional[str] = Query(None, description="Filtrar por tipo de entrevista (opcional)"),
+    before_id: Optional[int] = Query(None, description="Cursor: id del último resultado de la página anterior"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: UserModel = Depends(get_current_user)
+):
+    query = db.query(InterviewResult).filter(InterviewResult.user_id == current_user.id)
+
+    if interview_type:
+        if interview_type not in INTERVIEW_TRACKS:
+            raise HTTPException(status_code=400, detail="Tipo de entrevista no válido")
+        query = query.filter(InterviewResult.track == interview_type)
+
+    # Paginación keyset: evita OFFSET, que recorre todas las filas anteriores
+    if before_id is not None:
+        query = query.filter(InterviewResult.id < before_id)
+
+    results = query.order_by(InterviewResult.id.desc()).limit(limit).all()
+
+    items = [
+        {
+            "id": result.id,
+            "interview_type": result.track,
+            "score": result.score,
+            "created_at": result.created_at,
+        }
+        for result in results
+    ]
+    next_cursor = items[-1]["id"] if len(items) == limit else None
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=jsonable_encoder({"items": items, "next_cursor": next_cursor})
+    )
+
 @router.get('/user-stats', status_code=status.HTTP_200_OK, summary="Get all user statistics")
 def get_user_stats(
     db: db_dependency,
@@ -458,6 +507,8 @@ def get_user_stats(
         "level": user.level,
         "rating_interview_front_react": user.rating_interview_front_react,
         "rating_interview_backend_python": user.rating_interview_backend_python,
+        "interviews_front_react": user.interviews_front_react,
+        "interviews_backend_python": user.interviews_backend_python,
     }
 
     return JSONResponse(
@@ -0,0 +1,2 @@
+from .storage import LocalStorage, CloudinaryStorage, get_storage
+from .images import read_upload, process_image_offloaded, shutdown_process_pool
\ No newline at end of file
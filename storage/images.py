@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, Request
+from PIL import Image, ImageOps, UnidentifiedImageError
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_MAX_PIXELS = 40_000_000
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+PROFILE_SIZE = (512, 512)
+THUMBNAIL_SIZE = (128, 128)
+
+_process_pool = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    # Criado sob demanda, depois do fork de cada worker do gunicorn. Os
+    # processos do pool não saem de um fork do worker (que tem threads,
+    # event loop e ligações à base de dados abertas), mas sim do forkserver
+    global _process_pool
+    if _process_pool is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _process_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context(method)
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+async def read_upload(request: Request, field_name: str = "file", max_bytes: Optional[int] = None):
+    """Lê o campo `field_name` de um corpo multipart à medida que chega.
+
+    Devolve (conteúdo, sha256 hex). Aborta com 413 assim que o ficheiro passa
+    de `max_bytes` (por defeito MAX_UPLOAD_BYTES), sem esperar pelo resto do corpo.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Esperado multipart/form-data")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + 64 * 1024:
+        raise HTTPException(status_code=413, detail="Arquivo muito grande")
+
+    state = {"header_field": b"", "header_value": b"", "in_field": False, "found": False}
+    data = bytearray()
+    hasher = hashlib.sha256()
+
+    def on_header_field(buf, start, end):
+        state["header_field"] += buf[start:end]
+
+    def on_header_value(buf, start, end):
+        state["header_value"] += buf[start:end]
+
+    def on_header_end():
+        if state["header_field"].lower() == b"content-disposition":
+            _, disposition = parse_options_header(state["header_value"])
+            state["in_field"] = disposition.get(b"name") == field_name.encode()
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_part_data(buf, start, end):
+        if not state["in_field"]:
+            return
+        chunk = buf[start:end]
+        if len(data) + len(chunk) > max_bytes:
+            raise HTTPException(status_code=413, detail="Arquivo muito grande")
+        data.extend(chunk)
+        hasher.update(chunk)
+
+    def on_part_end():
+        if state["in_field"]:
+            state["found"] = True
+        state["in_field"] = False
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    async for chunk in request.stream():
+        try:
+            parser.write(chunk)
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Multipart inválido: {e}")
+        # O resto do corpo (outros campos) não interessa
+        if state["found"]:
+            break
+
+    if not state["found"]:
+        raise HTTPException(status_code=400, detail=f"Campo '{field_name}' não encontrado")
+    return bytes(data), hasher.hexdigest()
+
+
+def _encode_webp(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="WEBP", quality=85)
+    return buffer.getvalue()
+
+
+def process_image(data: bytes):
+    """Decodifica e gera a imagem de perfil e a miniatura em WebP.
+
+    Executa no pool de processos; erros de decodificação viram ValueError.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise ValueError(f"Formato não suportado: {image.format}")
+            if image.width * image.height > IMAGE_MAX_PIXELS:
+                raise ValueError("Imagem com dimensões demasiado grandes")
+            image = ImageOps.exif_transpose(image).convert("RGB")
+
+            profile = image.copy()
+            profile.thumbnail(PROFILE_SIZE)
+            thumbnail = ImageOps.fit(image, THUMBNAIL_SIZE)
+            return _encode_webp(profile), _encode_webp(thumbnail)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"Imagem inválida: {e}")
+
+
+async def process_image_offloaded(data: bytes):
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_process_pool(), process_image, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,64 @@
+import io
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_BASE_URL = os.getenv("UPLOAD_BASE_URL", "/uploads")
+CLOUDINARY_FOLDER = os.getenv("CLOUDINARY_FOLDER", "flash4devs/profile")
+
+# Os backends expõem a mesma interface síncrona:
+#   save(name, data, content_type) -> URL pública
+# Guardar duas vezes o mesmo nome é seguro e devolve a mesma URL; a
+# deduplicação por hash fica na tabela uploaded_images
+
+
+class LocalStorage:
+    def __init__(self, directory: str = UPLOAD_DIR, base_url: str = UPLOAD_BASE_URL):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def save(self, name: str, data: bytes, content_type: str) -> str:
+        # Escreve num temporário único e renomeia, para nunca servir um ficheiro
+        # a meio nem misturar duas subidas simultâneas da mesma imagem
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return f"{self.base_url}/{name}"
+
+
+class CloudinaryStorage:
+    # Configurado pela variável de ambiente CLOUDINARY_URL. O SDK é importado
+    # nos métodos para ler a configuração depois de o .env estar carregado
+    def __init__(self, folder: str = CLOUDINARY_FOLDER):
+        self.folder = folder
+
+    def _public_id(self, name: str) -> str:
+        return f"{self.folder}/{os.path.splitext(name)[0]}"
+
+    def save(self, name: str, data: bytes, content_type: str) -> str:
+        import cloudinary.uploader
+
+        result = cloudinary.uploader.upload(
+            io.BytesIO(data),
+            public_id=self._public_id(name),
+            resource_type="image",
+            # Com public_id determinístico, um asset existente é devolvido tal qual
+            overwrite=False,
+        )
+        return result["secure_url"]
+
+
+def get_storage():
+    if STORAGE_BACKEND == "local":
+        return LocalStorage()
+    return CloudinaryStorage()
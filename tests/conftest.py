@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Configuração antes de importar a app: SQLite temporário e armazenamento local
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp_dir, "uploads")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from bd.database import Base, SessionLocal, engine  # noqa: E402
+from main import app  # noqa: E402
+from models.models import User  # noqa: E402
+from routers.auth import verify_token  # noqa: E402
+
+TEST_USER_ID = "auth0|test-user"
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    session.add(User(id=TEST_USER_ID))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[verify_token] = lambda: {"sub": TEST_USER_ID}
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -0,0 +1,151 @@
+import gzip
+import os
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import main
+import middleware.compression as compression
+from middleware.compression import CompressionMiddleware
+from models.models import Flashcard
+from tests.conftest import TEST_USER_ID
+
+
+@pytest.fixture
+def cards(db):
+    db.add_all([
+        Flashcard(question=f"¿Qué hace useEffect en el caso {i}?", category="react", difficult="easy")
+        for i in range(200)
+    ])
+    db.commit()
+
+
+def raw_get(client, path, **headers):
+    # Desativa a descompressão automática do httpx para ver o corpo como vai no fio
+    request = client.build_request("GET", path, headers={"Accept-Encoding": "identity", **headers})
+    return client.send(request, stream=True)
+
+
+def read_raw(response):
+    body = b"".join(response.iter_raw())
+    response.close()
+    return body
+
+
+def test_json_gets_weak_etag_cache_control_and_vary(client, cards):
+    response = client.get("/card/get-all")
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_etag_ignores_negotiated_encoding(client, cards):
+    etags = {raw_get(client, "/card/get-all", **{"Accept-Encoding": encoding}).headers["etag"]
+             for encoding in ("identity", "gzip", "br")}
+    assert len(etags) == 1
+
+
+@pytest.mark.parametrize("if_none_match", [
+    lambda etag: etag,
+    lambda etag: etag.removeprefix("W/"),
+    lambda etag: f'"other", {etag}',
+    lambda etag: "*",
+])
+def test_if_none_match_returns_304(client, cards, if_none_match):
+    etag = client.get("/card/get-all").headers["etag"]
+    response = raw_get(client, "/card/get-all", **{"If-None-Match": if_none_match(etag)})
+    assert response.status_code == 304
+    assert read_raw(response) == b""
+    assert response.headers["etag"] == etag
+    assert "content-type" not in response.headers
+
+
+def test_stale_etag_returns_full_body(client, cards):
+    response = client.get("/card/get-all", headers={"If-None-Match": 'W/"stale"'})
+    assert response.status_code == 200
+    assert len(response.json()) == 200
+
+
+def test_per_user_endpoint_gets_etag_and_304(client, db):
+    response = client.get(f"/api/user/{TEST_USER_ID}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get(f"/api/user/{TEST_USER_ID}", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_small_body_is_not_compressed(client, db):
+    response = raw_get(client, f"/api/user/{TEST_USER_ID}", **{"Accept-Encoding": "br, gzip"})
+    assert len(read_raw(response)) < compression.COMPRESSION_MIN_SIZE
+    assert "content-encoding" not in response.headers
+
+
+def test_brotli_preferred_over_gzip(client, cards):
+    response = raw_get(client, "/card/get-all", **{"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    body = read_raw(response)
+    assert int(response.headers["content-length"]) == len(body)
+    assert len(brotli.decompress(body)) > len(body)
+
+
+def test_gzip_when_brotli_refused(client, cards):
+    response = raw_get(client, "/card/get-all", **{"Accept-Encoding": "br;q=0, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(read_raw(response)).startswith(b"[")
+
+
+def test_identity_when_everything_refused(client, cards):
+    response = raw_get(client, "/card/get-all", **{"Accept-Encoding": "br;q=0, gzip; q=0"})
+    assert "content-encoding" not in response.headers
+    assert read_raw(response).startswith(b"[")
+
+
+def test_non_200_passes_through(client, db):
+    response = client.get("/card/get-all")
+    assert response.status_code == 404
+    assert "etag" not in response.headers
+    assert "cache-control" not in response.headers
+
+
+def test_existing_etag_passes_through(client, db):
+    path = os.path.join(main.storage.directory, "static.txt")
+    with open(path, "w") as f:
+        f.write("x" * 4096)
+    response = raw_get(client, "/uploads/static.txt", **{"Accept-Encoding": "gzip"})
+    assert not response.headers["etag"].startswith("W/")
+    assert "content-encoding" not in response.headers
+    assert len(read_raw(response)) == 4096
+
+
+def test_large_body_compressed_off_the_event_loop(client, db, monkeypatch):
+    db.add_all([Flashcard(question="x" * 500, category="react", difficult="easy") for _ in range(200)])
+    db.commit()
+    offloaded = []
+    real_run_in_threadpool = compression.run_in_threadpool
+
+    async def tracking_run_in_threadpool(func, *args):
+        offloaded.append(len(args[0]))
+        return await real_run_in_threadpool(func, *args)
+
+    monkeypatch.setattr(compression, "run_in_threadpool", tracking_run_in_threadpool)
+    response = client.get("/card/get-all", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert offloaded and offloaded[0] >= compression.COMPRESSION_THREADPOOL_SIZE
+
+
+def test_streaming_response_is_not_buffered():
+    app = FastAPI()
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((b"chunk" * 1000 for _ in range(3)), media_type="text/plain")
+
+    app.add_middleware(CompressionMiddleware)
+    response = TestClient(app).get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert "etag" not in response.headers
+    assert response.content == b"chunk" * 3000
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from models.models import Flashcard, User
+from tests.conftest import TEST_USER_ID
+
+CARD = {"question": "¿Qué es el virtual DOM?", "category": "react", "difficult": "easy"}
+
+ADMIN_ROUTES = [
+    ("post", "/card/register", CARD),
+    ("put", "/card/update/1", CARD),
+    ("delete", "/card/by-id/1", None),
+    ("post", "/card/register-codingcard", CARD),
+    ("post", "/card/frontend-react", {"question": "useMemo vs useCallback"}),
+    ("post", "/card/backend-python", {"question": "¿Qué es el GIL?"}),
+]
+
+
+@pytest.fixture
+def card(db):
+    card = Flashcard(id=1, **CARD)
+    db.add(card)
+    db.commit()
+    return card
+
+
+def make_admin(db):
+    db.get(User, TEST_USER_ID).role = "admin"
+    db.commit()
+
+
+@pytest.mark.parametrize("method,path,body", ADMIN_ROUTES)
+def test_write_routes_require_authentication(db, card, method, path, body):
+    response = TestClient(app).request(method, path, json=body)
+    assert response.status_code in (401, 403)
+    assert db.get(Flashcard, 1) is not None
+
+
+@pytest.mark.parametrize("method,path,body", ADMIN_ROUTES)
+def test_write_routes_require_admin(client, card, method, path, body):
+    response = client.request(method, path, json=body)
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("method,path,body", ADMIN_ROUTES)
+def test_admin_can_write(client, db, card, method, path, body):
+    make_admin(db)
+    assert client.request(method, path, json=body).status_code in (200, 201)
+
+
+def test_delete_missing_card_returns_404(client, db):
+    make_admin(db)
+    assert client.delete("/card/by-id/999").status_code == 404
+
+
+def test_user_cannot_promote_itself(client, db):
+    response = client.put(f"/api/user/{TEST_USER_ID}", json={"id": TEST_USER_ID, "role": "admin"})
+    assert response.status_code == 200
+    db.expire_all()
+    assert db.get(User, TEST_USER_ID).role == "user"
@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from middleware.idempotency import (
+    DatabaseIdempotencyStore, IdempotencyMiddleware, MemoryIdempotencyStore, idempotency_metrics
+)
+from models.models import IdempotencyKey
+
+HEADERS = {"Idempotency-Key": "retry-1", "Authorization": "Bearer token"}
+
+
+@pytest.fixture(params=["memory", "db"])
+def store_factory(request, db):
+    if request.param == "memory":
+        return MemoryIdempotencyStore
+    return DatabaseIdempotencyStore
+
+
+def build_app(store, delay=0.05, **middleware_options):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/answers")
+    async def answers(payload: dict):
+        app.state.calls += 1
+        await asyncio.sleep(delay)
+        return {"call": app.state.calls}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        app.state.calls += 1
+        await request.body()
+        return {"call": app.state.calls}
+
+    app.add_middleware(IdempotencyMiddleware, store=store, **middleware_options)
+    return app
+
+
+def post(app, path="/answers", **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(run())
+
+
+def test_duplicate_burst_runs_endpoint_once(store_factory):
+    app = build_app(store_factory())
+    before = dict(idempotency_metrics)
+
+    async def burst():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/answers", json={"type": "good"}, headers=HEADERS) for _ in range(20)
+            ])
+
+    responses = asyncio.run(burst())
+    assert app.state.calls == 1
+    originals = [r for r in responses if r.status_code == 200 and "idempotent-replayed" not in r.headers]
+    replays = [r for r in responses if r.headers.get("idempotent-replayed") == "true"]
+    conflicts = [r for r in responses if r.status_code == 409]
+    assert len(originals) == 1
+    assert len(replays) + len(conflicts) == 19
+    assert all(r.json() == {"call": 1} for r in originals + replays)
+
+    replay = post(app, json={"type": "good"}, headers=HEADERS)
+    assert replay.status_code == 200
+    assert replay.json() == {"call": 1}
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert app.state.calls == 1
+
+    assert idempotency_metrics["misses"] - before["misses"] == 1
+    assert idempotency_metrics["conflicts"] - before["conflicts"] == len(conflicts)
+    assert idempotency_metrics["hits"] - before["hits"] == len(replays) + 1
+
+
+def test_key_reused_with_different_body_is_rejected(store_factory):
+    app = build_app(store_factory(), delay=0)
+    assert post(app, json={"type": "good"}, headers=HEADERS).status_code == 200
+    assert post(app, json={"type": "bad"}, headers=HEADERS).status_code == 422
+    assert app.state.calls == 1
+
+
+def test_cancelled_request_releases_key(store_factory):
+    store = store_factory()
+    app = build_app(store, delay=10)
+    body = b'{"type": "good"}'
+    scope = {
+        "type": "http", "method": "POST", "path": "/answers", "raw_path": b"/answers",
+        "root_path": "", "scheme": "http", "query_string": b"", "http_version": "1.1",
+        "server": ("test", 80), "client": ("test", 1234),
+        "headers": [
+            (b"idempotency-key", b"retry-1"), (b"authorization", b"Bearer token"),
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+        ],
+    }
+
+    async def cancel_midway():
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            pass
+
+        task = asyncio.create_task(app(scope, receive, send))
+        while app.state.calls == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_midway())
+
+    # Liberada: el reintento ejecuta el endpoint en vez de recibir 409
+    retry_app = build_app(store, delay=0)
+    response = post(retry_app, content=body, headers={**HEADERS, "Content-Type": "application/json"})
+    assert response.status_code == 200
+    assert retry_app.state.calls == 1
+
+
+def test_stale_in_flight_reservation_is_taken_over(store_factory):
+    store = store_factory(lock_ttl=0)
+    assert store.reserve("k", "h") is None
+    time.sleep(0.01)
+    assert store.reserve("k", "h") is None
+
+    store = store_factory(lock_ttl=60)
+    assert store.reserve("k2", "h") is None
+    assert store.reserve("k2", "h")["status_code"] is None
+
+
+def test_body_size_is_capped(store_factory):
+    app = build_app(store_factory(), delay=0, max_body=16)
+    response = post(app, json={"type": "good", "padding": "x" * 32}, headers=HEADERS)
+    assert response.status_code == 413
+    assert app.state.calls == 0
+
+
+def test_multipart_bypasses_buffering(store_factory):
+    app = build_app(store_factory(), delay=0, max_body=16)
+    for _ in range(2):
+        response = post(app, "/upload", files={"file": ("a.bin", b"x" * 1024)}, headers=HEADERS)
+        assert response.status_code == 200
+    assert app.state.calls == 2
+
+
+def test_expired_response_is_replaced(store_factory):
+    store = store_factory(ttl=0)
+    assert store.reserve("k", "h") is None
+    store.save("k", 200, "application/json", b'{"call":1}')
+    time.sleep(0.01)
+    # Caducada: una nueva petición con la misma clave se ejecuta
+    assert store.reserve("k", "h2") is None
+
+
+def test_database_store_purges_only_on_sampled_calls(db):
+    store = DatabaseIdempotencyStore(ttl=0, purge_rate=0)
+    for key in ("a", "b"):
+        store.reserve(key, "h")
+        store.save(key, 200, None, b"")
+    time.sleep(0.01)
+    store.reserve("c", "h")
+    assert db.query(IdempotencyKey).count() == 3
+
+    DatabaseIdempotencyStore(purge_rate=1).reserve("d", "h")
+    assert {row.key for row in db.query(IdempotencyKey)} == {"d"}
+
+
+def test_memory_store_never_evicts_in_flight_reservations():
+    store = MemoryIdempotencyStore(maxsize=2)
+    assert store.reserve("in-flight", "h") is None
+    for key in ("a", "b", "c"):
+        store.reserve(key, "h")
+        store.save(key, 200, None, b"")
+    assert store.reserve("in-flight", "h")["status_code"] is None
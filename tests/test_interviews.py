@@ -0,0 +1,44 @@
+from models.models import User
+from tests.conftest import TEST_USER_ID
+
+
+def rate(client, rating, interview_type="frontend_react"):
+    return client.put("/card/update-interview-rating", json={"rating": rating, "interview_type": interview_type})
+
+
+def test_rating_updates_running_average_and_count(client, db):
+    for rating in (2, 4, 6):
+        assert rate(client, rating).status_code == 200
+
+    stats = client.get("/card/user-stats").json()
+    assert stats["rating_interview_front_react"] == 4.0
+    assert stats["interviews_front_react"] == 3
+    assert stats["rating_interview_backend_python"] is None
+    assert stats["interviews_backend_python"] == 0
+
+
+def test_rating_rejects_unknown_type_and_out_of_range(client, db):
+    assert rate(client, 5, "cobol").status_code == 400
+    assert rate(client, -1).status_code == 422
+    assert rate(client, 11).status_code == 422
+
+    user = db.get(User, TEST_USER_ID)
+    db.refresh(user)
+    assert user.interviews_front_react == 0
+
+
+def test_history_keyset_pagination(client, db):
+    for rating in range(5):
+        rate(client, rating)
+    rate(client, 9, "backend_python")
+
+    first = client.get("/card/interview-history", params={"limit": 4}).json()
+    assert [item["score"] for item in first["items"]] == [9, 4, 3, 2]
+    assert first["next_cursor"] == first["items"][-1]["id"]
+
+    second = client.get("/card/interview-history", params={"limit": 4, "before_id": first["next_cursor"]}).json()
+    assert [item["score"] for item in second["items"]] == [1, 0]
+    assert second["next_cursor"] is None
+
+    filtered = client.get("/card/interview-history", params={"interview_type": "backend_python"}).json()
+    assert [item["score"] for item in filtered["items"]] == [9]
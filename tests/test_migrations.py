@@ -0,0 +1,61 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from bd.migrations import upgrade_schema
+from models.models import User
+
+OLD_USERS_TABLE = """
+CREATE TABLE users (
+    id VARCHAR(255) PRIMARY KEY,
+    email VARCHAR(255),
+    name VARCHAR(255),
+    last_name VARCHAR(255),
+    role VARCHAR(50),
+    profile_image VARCHAR(255),
+    created_at DATETIME,
+    good_answers INTEGER,
+    bad_answers INTEGER,
+    level VARCHAR(50),
+    rating_interview_front_react VARCHAR(50) DEFAULT 'N/A',
+    rating_interview_backend_python VARCHAR(50) DEFAULT 'N/A'
+)
+"""
+
+
+def test_upgrade_schema_migrates_old_users_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(OLD_USERS_TABLE))
+        connection.execute(text("INSERT INTO users (id) VALUES ('old-user')"))
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)  # idempotente
+
+    columns = {column["name"] for column in inspect(engine).get_columns("users")}
+    assert {"interviews_front_react", "interviews_backend_python"} <= columns
+
+    with engine.connect() as connection:
+        row = connection.execute(text(
+            "SELECT rating_interview_front_react, rating_interview_backend_python, "
+            "interviews_front_react, interviews_backend_python FROM users"
+        )).one()
+    assert tuple(row) == (None, None, 0, 0)
+
+    # O modelo atual carrega o utilizador antigo
+    with Session(engine) as session:
+        assert session.get(User, "old-user").interviews_front_react == 0
+
+
+def test_upgrade_schema_adds_idempotency_lease_column(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE idempotency_keys (key VARCHAR(64) PRIMARY KEY, request_hash VARCHAR(64), "
+            "status_code INTEGER, content_type VARCHAR(255), body BLOB, expires_at DATETIME)"
+        ))
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("idempotency_keys")}
+    assert "locked_until" in columns
@@ -0,0 +1,88 @@
+import io
+import os
+import threading
+
+from PIL import Image
+
+import main
+from models.models import User
+from storage import LocalStorage
+from tests.conftest import TEST_USER_ID
+
+
+def png_bytes(color="red", size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_upload_sets_profile_image_and_dedups(client, db, monkeypatch):
+    calls = []
+    process = main.process_image_offloaded
+
+    async def counting_process(data):
+        calls.append(len(data))
+        return await process(data)
+
+    monkeypatch.setattr(main, "process_image_offloaded", counting_process)
+    image = png_bytes()
+
+    first = client.post("/api/upload", files={"file": ("a.png", image, "image/png")})
+    assert first.status_code == 200
+    assert client.get(first.json()["thumbnail_url"]).status_code == 200
+
+    second = client.post("/api/upload", files={"file": ("b.png", image, "image/png")})
+    assert second.json() == first.json()
+    assert len(calls) == 1
+
+    db.expire_all()
+    assert db.get(User, TEST_USER_ID).profile_image == first.json()["url"]
+
+
+def test_upload_rejects_bad_input(client, db):
+    malformed = client.post(
+        "/api/upload", content=b"--abc\r\nnot a header line\r\n\r\nxx",
+        headers={"Content-Type": "multipart/form-data; boundary=abc"}
+    )
+    assert malformed.status_code == 400
+    assert malformed.json()["detail"].startswith("Multipart inválido")
+
+    assert client.post("/api/upload", files={"other": ("a.png", b"x", "image/png")}).status_code == 400
+    assert client.post("/api/upload", files={"file": ("a.png", b"not an image", "image/png")}).status_code == 400
+
+
+def test_upload_size_cap(client, db, monkeypatch):
+    monkeypatch.setattr("storage.images.MAX_UPLOAD_BYTES", 1024)
+    response = client.post("/api/upload", files={"file": ("a.png", b"x" * 4096, "image/png")})
+    assert response.status_code == 413
+
+
+def test_local_storage_concurrent_saves_of_same_name(tmp_path):
+    storage = LocalStorage(directory=str(tmp_path), base_url="/uploads")
+    payloads = [bytes([i]) * 65536 for i in range(8)]
+    errors = []
+
+    def save(data):
+        try:
+            storage.save("same.webp", data, "image/webp")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(data,)) for data in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ["same.webp"]
+    assert (tmp_path / "same.webp").read_bytes() in payloads
+
+
+def test_process_pool_does_not_fork_the_worker():
+    from storage.images import get_process_pool, shutdown_process_pool
+
+    try:
+        assert get_process_pool()._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        shutdown_process_pool()
@@ -0,0 +1,198 @@
+import asyncio
+import base64
+import importlib.util
+import os
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import main
+from bd.database import engine, warmup_pool
+from routers import auth
+
+RealAsyncClient = httpx.AsyncClient
+DOMAIN = "tenant.example.com"
+AUDIENCE = "https://api.flash4devs"
+
+
+def b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = private_key.public_key().public_numbers()
+    jwk = {"kty": "RSA", "kid": kid, "use": "sig", "n": b64url_uint(numbers.n), "e": b64url_uint(numbers.e)}
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return jwk, pem
+
+
+def make_token(pem, kid, sub="auth0|123"):
+    claims = {"sub": sub, "aud": AUDIENCE, "iss": f"https://{DOMAIN}/"}
+    return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeJWKSServer:
+    """Substitui httpx.AsyncClient em routers.auth e conta os pedidos ao JWKS."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.requests = 0
+        self.status_code = 200
+        self.delay = 0
+
+    def client(self, *args, **kwargs):
+        async def handler(request):
+            self.requests += 1
+            await asyncio.sleep(self.delay)
+            return httpx.Response(self.status_code, json={"keys": self.keys})
+        return RealAsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def jwks_server(monkeypatch):
+    server = FakeJWKSServer([])
+    monkeypatch.setattr(auth.httpx, "AsyncClient", server.client)
+    monkeypatch.setattr(auth, "AUTH0_DOMAIN", DOMAIN)
+    monkeypatch.setattr(auth, "AUTH0_AUDIENCE", AUDIENCE)
+    monkeypatch.setitem(auth._jwks_cache, "jwks", None)
+    monkeypatch.setitem(auth._jwks_cache, "fetched_at", 0.0)
+    # Cada teste corre num event loop novo
+    monkeypatch.setattr(auth, "_jwks_lock", asyncio.Lock())
+    return server
+
+
+def age_cache(seconds):
+    auth._jwks_cache["fetched_at"] -= seconds
+
+
+def test_jwks_is_cached_until_ttl(jwks_server):
+    asyncio.run(auth.get_jwks())
+    asyncio.run(auth.get_jwks())
+    assert jwks_server.requests == 1
+
+    age_cache(auth.JWKS_CACHE_TTL + 1)
+    asyncio.run(auth.get_jwks())
+    assert jwks_server.requests == 2
+
+
+def test_forced_refresh_is_rate_limited(jwks_server):
+    asyncio.run(auth.get_jwks())
+    asyncio.run(auth.get_jwks(force_refresh=True))
+    assert jwks_server.requests == 1
+
+    age_cache(auth.JWKS_MIN_REFRESH_INTERVAL + 1)
+    asyncio.run(auth.get_jwks(force_refresh=True))
+    assert jwks_server.requests == 2
+
+
+def test_unknown_kid_refreshes_rotated_keys(jwks_server):
+    old_jwk, _ = make_key("old")
+    new_jwk, new_pem = make_key("new")
+    jwks_server.keys = [old_jwk]
+    asyncio.run(auth.get_jwks())
+
+    # O Auth0 rotacionou as chaves depois do arranque
+    jwks_server.keys = [old_jwk, new_jwk]
+    age_cache(auth.JWKS_MIN_REFRESH_INTERVAL + 1)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=make_token(new_pem, "new"))
+    payload = asyncio.run(auth.verify_token(credentials))
+    assert payload["sub"] == "auth0|123"
+    assert jwks_server.requests == 2
+
+
+def test_unknown_kid_does_not_refetch_within_interval(jwks_server):
+    jwk, _ = make_key("known")
+    _, bogus_pem = make_key("bogus")
+    jwks_server.keys = [jwk]
+    asyncio.run(auth.get_jwks())
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=make_token(bogus_pem, "bogus"))
+    for _ in range(3):
+        with pytest.raises(auth.HTTPException) as error:
+            asyncio.run(auth.verify_token(credentials))
+        assert error.value.status_code == 401
+    assert jwks_server.requests == 1
+
+
+def test_concurrent_refreshes_fetch_once(jwks_server):
+    jwks_server.delay = 0.05
+
+    async def burst():
+        return await asyncio.gather(*[auth.get_jwks() for _ in range(10)])
+
+    results = asyncio.run(burst())
+    assert jwks_server.requests == 1
+    assert all(result == {"keys": []} for result in results)
+
+
+def test_failed_refresh_falls_back_to_cached_jwks(jwks_server):
+    jwk, _ = make_key("known")
+    jwks_server.keys = [jwk]
+    asyncio.run(auth.get_jwks())
+
+    jwks_server.status_code = 503
+    age_cache(auth.JWKS_CACHE_TTL + 1)
+    assert asyncio.run(auth.get_jwks()) == {"keys": [jwk]}
+    # Não volta a pedir antes do intervalo mínimo
+    asyncio.run(auth.get_jwks())
+    assert jwks_server.requests == 2
+
+
+def test_failed_first_fetch_raises(jwks_server):
+    jwks_server.status_code = 503
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(auth.get_jwks())
+
+
+def test_warmup_pool_opens_pool_connections(db):
+    engine.dispose()
+    warmup_pool()
+    assert engine.pool.checkedin() == engine.pool.size()
+    assert engine.pool.checkedout() == 0
+
+
+def test_post_fork_discards_inherited_connections(db):
+    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", config_path)
+    gunicorn_conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gunicorn_conf)
+    assert gunicorn_conf.preload_app is True
+    assert gunicorn_conf.worker_class == "uvicorn.workers.UvicornWorker"
+
+    warmup_pool()
+    inherited_pool = engine.pool
+    gunicorn_conf.post_fork(server=None, worker=None)
+    assert engine.pool is not inherited_pool
+    assert engine.pool.checkedin() == 0
+
+
+def test_lifespan_warms_up_before_serving(db, monkeypatch):
+    calls = []
+
+    async def fake_get_jwks(force_refresh=False):
+        calls.append("jwks")
+        return {"keys": []}
+
+    monkeypatch.setattr(main, "get_jwks", fake_get_jwks)
+    monkeypatch.setattr(main, "warmup_pool", lambda: calls.append("pool"))
+    with TestClient(main.app) as client:
+        assert calls == ["jwks", "pool"]
+        assert client.get("/health").status_code == 200
+
+
+def test_lifespan_tolerates_unreachable_jwks(db, monkeypatch):
+    async def failing_get_jwks(force_refresh=False):
+        raise httpx.ConnectError("sem rede")
+
+    monkeypatch.setattr(main, "get_jwks", failing_get_jwks)
+    with TestClient(main.app) as client:
+        assert client.get("/health").status_code == 200